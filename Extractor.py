@@ -1,93 +1,211 @@
 import serial
 import time
 from midiutil import MIDIFile
+try:
+    from midiutil.MidiFile import NoteOn, NoteOff
+except ImportError:  # Event classes moved, notes go through MIDIFile.addNote
+    NoteOn = NoteOff = None
 import os
-import tkinter as tk
-from tkinter import filedialog
 import sys
+import re
+import select
+import queue
+import subprocess
+import threading
+
+# Map 1-9 and A-I to the   notes (expanded range)
+# MIDI note numbers reference: C4 is 60, each semitone up is +1
+NOTE_MAPPING = {
+    # Original mapping for digits 1-9
+    '1': 83,  # B5
+    '2': 82,  # A#5/Bb5
+    '3': 81,  # A5
+    '4': 79,  # G5
+    '5': 78,  # F#5/Gb5
+    '6': 77,  # F5
+    '7': 76,  # E5
+    '8': 74,  # D5
+    '9': 75,  # D#5/Eb5
+    
+    # New mapping for letters A-I (extending the range to lower octaves)
+    'A': 72,  # C5
+    'B': 71,  # B4
+    'C': 70,  # A#4/Bb4
+    'D': 69,  # A4
+    'E': 67,  # G4
+    'F': 66,  # F#4/Gb4
+    'G': 65,  # F4
+    'H': 64,  # E4
+    'I': 62   # D4
+}
+
+# 256-entry byte -> MIDI pitch table (0 = invalid character), applied with
+# bytes.translate after filtering. Lowercase entries are included so that
+# _INVALID_BYTES, derived from this table, keeps a-i as valid characters
+_PITCH_LUT = bytearray(256)
+for _char, _pitch in NOTE_MAPPING.items():
+    _PITCH_LUT[ord(_char)] = _pitch
+    _PITCH_LUT[ord(_char.lower())] = _pitch
+_PITCH_LUT = bytes(_PITCH_LUT)
+
+# Every byte that does not map to a note, for the delete argument of translate
+_INVALID_BYTES = bytes(i for i in range(256) if not _PITCH_LUT[i])
+
+# Case folding table mapping a-i to A-I, so filtering and uppercasing can be
+# done with a single translate(_UPPER_LUT, _INVALID_BYTES) call
+_UPPER_LUT = bytes(i - 32 if ord('a') <= i <= ord('i') else i for i in range(256))
+
+# Track setup shared by every generated file
+TRACK = 0
+CHANNEL = 0
+NOTE_DURATION = 0.5  # Each note is half a beat
+VOLUME = 100  # 0-127
+
+# Matches a run of one repeated byte, used to fuse repeated pitches into a single note
+_RUN_PATTERN = re.compile(rb"(.)\1*", re.DOTALL)
+
+def _create_midi(tempo, instrument):
+    """
+    Create a one-track MIDI file with the track name, tempo and instrument set.
+    """
+    midi = MIDIFile(1)
+    
+    # Add track name and tempo
+    midi.addTrackName(TRACK, 0, "  Scale from Characters")
+    midi.addTempo(TRACK, 0, tempo)
+    
+    # Set instrument to   (program change)
+    midi.addProgramChange(TRACK, CHANNEL, 0, instrument)
+    return midi
+
+def _pitch_runs(pitches, offset=0):
+    """
+    Split pitch bytes into (pitch, start, length) runs of one repeated pitch, with
+    start and length counted in characters and start shifted by offset.
+    """
+    return [
+        (pitches[run.start()], offset + run.start(), run.end() - run.start())
+        for run in _RUN_PATTERN.finditer(pitches)
+    ]
+
+def _add_notes(midi, runs):
+    """
+    Add (pitch, start, length) runs to the track, one note per run, so that
+    consecutive identical pitches become a single longer note.
+    """
+    # Build the (pitch, start, duration) notes up front, then add them to the track in one pass
+    notes = [(pitch, start * NOTE_DURATION, length * NOTE_DURATION) for pitch, start, length in runs]
+    try:
+        # Append NoteOn/NoteOff pairs straight to the track's event list,
+        # skipping addNote's per-call track and tick lookups
+        midi_track = midi.tracks[TRACK + 1 if midi.header.numeric_format == 1 else TRACK]
+        to_ticks = midi.time_to_ticks
+        order = midi.event_counter
+        events = []
+        for pitch, start_time, duration in notes:
+            tick = to_ticks(start_time)
+            tick_duration = to_ticks(duration)
+            events.append(NoteOn(CHANNEL, pitch, tick, tick_duration, VOLUME, insertion_order=order))
+            events.append(NoteOff(CHANNEL, pitch, tick + tick_duration, VOLUME, insertion_order=order))
+            order += 1
+        midi_track.eventList.extend(events)
+        midi.event_counter = order
+    except (AttributeError, IndexError, TypeError):
+        # midiutil internals differ from what we expect, use the public API
+        add_note = midi.addNote
+        for pitch, start_time, duration in notes:
+            add_note(TRACK, CHANNEL, pitch, start_time, duration, VOLUME)
+
+def _write_midi_file(midi, output_filename):
+    """
+    Write the MIDI file to disk.
+    """
+    with open(output_filename, "wb") as output_file:
+        midi.writeFile(output_file)
+
+def _finish_midi_file(midi, valid_bytes, output_filename):
+    """
+    Write the MIDI file, report it, and return the converted characters as a list.
+    """
+    _write_midi_file(midi, output_filename)
+    
+    print(f"MIDI file '{output_filename}' created successfully.")
+    print(f"Converted {len(valid_bytes)} characters to   notes.")
+    return list(valid_bytes.decode('ascii'))
+
+def _midi_note_consumer(chunks, midi, errors):
+    """
+    Add notes for each chunk of valid characters taken from the queue until
+    a None sentinel is received. Runs in a background thread during capture;
+    any exception is appended to errors instead of being lost with the thread.
+    """
+    try:
+        _consume_midi_notes(chunks, midi)
+    except Exception as e:
+        errors.append(e)
+
+def _consume_midi_notes(chunks, midi):
+    """
+    Consumer loop behind _midi_note_consumer. The trailing run of each chunk is
+    held open as (run_pitch, run_start, run_len), since it may continue in the next
+    chunk, so each chunk costs O(len(chunk)) however long a pitch repeats.
+    """
+    offset = 0
+    run_pitch = None
+    run_start = run_len = 0
+    while True:
+        chunk = chunks.get()
+        if chunk is None:
+            break
+        runs = _pitch_runs(chunk.translate(_PITCH_LUT), offset)
+        offset += len(chunk)
+        
+        # The chunk's first run may extend the open run
+        if runs[0][0] == run_pitch:
+            run_len += runs[0][2]
+            del runs[0]
+        if not runs:
+            continue
+        
+        # Close the open run and every complete run, then hold the last one open
+        if run_pitch is not None:
+            runs.insert(0, (run_pitch, run_start, run_len))
+        run_pitch, run_start, run_len = runs.pop()
+        _add_notes(midi, runs)
+    
+    if run_pitch is not None:
+        _add_notes(midi, [(run_pitch, run_start, run_len)])
 
 def convert_characters_to_midi(char_string, output_filename="output.mid", tempo=120, instrument=73):  # 73 is the MIDI number for  
     """
     Convert a string of characters 1-9 and A-I to a MIDI file using   notes.
     
     Parameters:
-    char_string (str): String containing digits 1-9 and letters A-I
+    char_string (str or bytes): String or bytes containing digits 1-9 and letters A-I
     output_filename (str): Output MIDI filename
     tempo (int): Tempo in BPM (beats per minute)
     instrument (int): MIDI instrument number (default: 73 for  )
     """
     # Clean the input string to only contain digits 1-9 and letters A-I (case insensitive)
-    valid_chars = []
-    for char in char_string:
-        if char.isdigit() and char != '0':
-            valid_chars.append(char)
-        elif char.upper() in 'ABCDEFGHI':
-            valid_chars.append(char.upper())
+    if isinstance(char_string, str):
+        char_string = char_string.encode('ascii', 'ignore')
+    valid_bytes = char_string.translate(_UPPER_LUT, _INVALID_BYTES)
     
-    if not valid_chars:
+    if not valid_bytes:
         print("No valid characters (1-9, A-I) found in the input string.")
         return None
     
-    # Create a MIDI file with one track
-    midi = MIDIFile(1)
-    
-    # Setup the track
-    track = 0
-    channel = 0
-    time = 0  # Start at the beginning
-    duration = 0.5  # Each note is half a beat
-    volume = 100  # 0-127
-    
-    # Add track name and tempo
-    midi.addTrackName(track, time, "  Scale from Characters")
-    midi.addTempo(track, time, tempo)
-    
-    # Set instrument to   (program change)
-    midi.addProgramChange(track, channel, time, instrument)
-    
-    # Map 1-9 and A-I to the   notes (expanded range)
-    # MIDI note numbers reference: C4 is 60, each semitone up is +1
-    note_mapping = {    
-        # Original mapping for digits 1-9
-        '1': 83,  # B5
-        '2': 82,  # A#5/Bb5
-        '3': 81,  # A5
-        '4': 79,  # G5
-        '5': 78,  # F#5/Gb5
-        '6': 77,  # F5
-        '7': 76,  # E5
-        '8': 74,  # D5
-        '9': 75,  # D#5/Eb5
-        
-        # New mapping for letters A-I (extending the range to lower octaves)
-        'A': 72,  # C5
-        'B': 71,  # B4
-        'C': 70,  # A#4/Bb4
-        'D': 69,  # A4
-        'E': 67,  # G4
-        'F': 66,  # F#4/Gb4
-        'G': 65,  # F4
-        'H': 64,  # E4
-        'I': 62   # D4
-    }
-    
-    # Add notes to the track
-    for i, char in enumerate(valid_chars):
-        if char in note_mapping:
-            pitch = note_mapping[char]
-            midi.addNote(track, channel, pitch, time + i * duration, duration, volume)
+    # Create a MIDI file with one track and add the notes to it
+    midi = _create_midi(tempo, instrument)
+    _add_notes(midi, _pitch_runs(valid_bytes.translate(_PITCH_LUT)))
     
     # Write the MIDI file
-    with open(output_filename, "wb") as output_file:
-        midi.writeFile(output_file)
-    
-    print(f"MIDI file '{output_filename}' created successfully.")
-    print(f"Converted {len(valid_chars)} characters to   notes.")
-    return valid_chars
+    return _finish_midi_file(midi, valid_bytes, output_filename)
 
-def read_from_serial_port(port='COM10', baud_rate=230400, read_duration=30, output_filename=None):
+def read_from_serial_port(port='COM10', baud_rate=230400, read_duration=30, output_filename=None, tempo=120, instrument=73):
     """
     Read data from serial port for a specified duration and convert to MIDI.
+    Notes are added to the MIDI file in a background thread while reading.
     Provides regular updates and opens a save dialog.
     
     Parameters:
@@ -95,6 +213,8 @@ def read_from_serial_port(port='COM10', baud_rate=230400, read_duration=30, outp
     baud_rate (int): Baud rate
     read_duration (int): How long to read from the serial port in seconds (default: 30)
     output_filename (str): Output MIDI filename or None to prompt for save location
+    tempo (int): Tempo in BPM (beats per minute)
+    instrument (int): MIDI instrument number (default: 73 for  )
     """
     try:
         # Configure and open serial port
@@ -105,46 +225,87 @@ def read_from_serial_port(port='COM10', baud_rate=230400, read_duration=30, outp
         # Clear any initial data
         ser.reset_input_buffer()
         
+        # On POSIX wait for data with select() rather than polling in_waiting
+        try:
+            fileno = ser.fileno()
+        except (AttributeError, OSError):
+            fileno = None
+        
+        # Start the background thread that turns captured chunks into notes
+        midi = _create_midi(tempo, instrument)
+        chunks = queue.Queue()
+        consumer_errors = []
+        consumer = threading.Thread(target=_midi_note_consumer, args=(chunks, midi, consumer_errors), daemon=True)
+        consumer.start()
+        
         # Read data for specified duration
-        start_time = time.time()
-        collected_data = ""
+        start_time = time.monotonic()
+        deadline = start_time + read_duration
+        collected_data = bytearray()
         update_interval = 1.0  # Update every 1 second
         next_update = start_time + update_interval
         
-        chars_read = 0
         progress_bar_width = 40
+        full_bar = "#" * progress_bar_width
+        
+        # Scale factors from elapsed seconds to percent and bar width, hoisted
+        # out of the loop so each update is two multiplications. A non-positive
+        # duration never enters the loop, so it only needs to avoid dividing by 0
+        inv_duration = 1.0 / read_duration if read_duration > 0 else 0.0
+        pct_scale = 100.0 * inv_duration
+        bar_scale = progress_bar_width * inv_duration
         
         # Initial progress bar
-        sys.stdout.write("[%s] 0%%" % (" " * progress_bar_width))
+        sys.stdout.write(f"[{' ' * progress_bar_width}] 0%")
         sys.stdout.flush()
-        sys.stdout.write("\r")
         
-        while time.time() - start_time < read_duration:
-            current_time = time.time()
-            elapsed = current_time - start_time
-            
-            # Update progress bar
-            if current_time >= next_update:
-                percent_complete = int((elapsed / read_duration) * 100)
-                progress = int(progress_bar_width * elapsed / read_duration)
-                progress_bar = "#" * progress + " " * (progress_bar_width - progress)
-                sys.stdout.write("[%s] %d%% (%d characters read)" % (progress_bar, percent_complete, chars_read))
-                sys.stdout.flush()
-                sys.stdout.write("\r")
-                next_update = current_time + update_interval
-            
-            # Read data one byte at a time to capture each character
-            if ser.in_waiting > 0:
-                byte_data = ser.read(1)
-                char_data = byte_data.decode('utf-8', errors='ignore')
+        try:
+            while True:
+                now = time.monotonic()
+                if now >= deadline:
+                    break
                 
-                # Accept digits 1-9 and letters A-I (case insensitive)
-                if (char_data.isdigit() and char_data != '0') or char_data.upper() in 'ABCDEFGHI':
-                    collected_data += char_data.upper() if char_data.isalpha() else char_data
-                    chars_read += 1
+                # Update progress bar
+                if now >= next_update:
+                    elapsed = now - start_time
+                    percent_complete = int(pct_scale * elapsed)
+                    progress = int(bar_scale * elapsed)
+                    progress_bar = full_bar[:progress] + " " * (progress_bar_width - progress)
+                    sys.stdout.write(f"\r[{progress_bar}] {percent_complete}% ({len(collected_data)} characters read)")
+                    sys.stdout.flush()
+                    next_update = now + update_interval
                 
+                # Block for the first byte, then drain whatever else is buffered
+                if fileno is not None:
+                    # select() wakes on data, the next progress update or the deadline
+                    wait = min(deadline, next_update) - now
+                    readable, _, _ = select.select([fileno], [], [], wait)
+                    # Always read at least 1 byte once readable, so a hang-up (readable
+                    # but no data) raises SerialException instead of spinning on read(0)
+                    chunk = ser.read(1) if readable else b""
+                else:
+                    # No file descriptor to select() on (e.g. Windows), block in read instead.
+                    # The port's 1 s timeout bounds the wait, so progress updates and the
+                    # deadline can be late by up to that much
+                    chunk = ser.read(1)
+                
+                if chunk:
+                    chunk += ser.read(ser.in_waiting)
+                    
+                    # Accept digits 1-9 and letters A-I (case insensitive)
+                    valid_data = chunk.translate(_UPPER_LUT, _INVALID_BYTES)
+                    if valid_data:
+                        collected_data.extend(valid_data)
+                        chunks.put(valid_data)
+        finally:
+            # Always stop the consumer, even if the capture loop fails
+            chunks.put(None)
+            consumer.join()
+        
+        chars_read = len(collected_data)
+        
         # Final progress bar update
-        sys.stdout.write("[%s] 100%% (%d characters read)\n" % ("#" * progress_bar_width, chars_read))
+        sys.stdout.write(f"\r[{full_bar}] 100% ({chars_read} characters read)\n")
         sys.stdout.flush()
         
         # Close the serial connection
@@ -155,14 +316,22 @@ def read_from_serial_port(port='COM10', baud_rate=230400, read_duration=30, outp
             print("No data received from serial port.")
             return None
             
+        if consumer_errors:
+            print(f"Error while converting data to MIDI: {consumer_errors[0]}")
+            return None
+            
         print(f"Data collection complete. {chars_read} characters collected.")
         
-        # Create a hidden tkinter root window
-        root = tk.Tk()
-        root.withdraw()  # Hide the root window
-        
         # If no output filename is provided, open a save dialog
         if output_filename is None:
+            # Tk is only imported when the dialog is actually needed
+            import tkinter as tk
+            from tkinter import filedialog
+            
+            # Create a hidden tkinter root window
+            root = tk.Tk()
+            root.withdraw()  # Hide the root window
+            
             output_filename = filedialog.asksaveasfilename(
                 defaultextension=".mid",
                 filetypes=[("MIDI Files", "*.mid"), ("All Files", "*.*")],
@@ -174,16 +343,20 @@ def read_from_serial_port(port='COM10', baud_rate=230400, read_duration=30, outp
             print("Save operation canceled.")
             return None
             
-        # Convert the collected data to MIDI
+        # Write the notes added during capture to the MIDI file
         print(f"Converting {chars_read} characters to MIDI file: {output_filename}")
-        chars = convert_characters_to_midi(collected_data, output_filename)
+        chars = _finish_midi_file(midi, collected_data, output_filename)
         
         # Open the folder containing the saved file
         if chars:
             folder_path = os.path.dirname(os.path.abspath(output_filename))
             print(f"Opening folder: {folder_path}")
-            # Open file explorer to the directory containing the file
-            os.startfile(folder_path) if sys.platform == 'win32' else os.system(f'open "{folder_path}"')
+            # Open file explorer to the directory containing the file, without a shell or waiting on it
+            opener = {'win32': 'explorer', 'darwin': 'open'}.get(sys.platform, 'xdg-open')
+            try:
+                subprocess.Popen([opener, folder_path])
+            except OSError as e:
+                print(f"Could not open folder: {e}")
         
         return chars
         
@@ -206,4 +379,4 @@ if __name__ == "__main__":
     
     print("Serial to MIDI Converter (1-9 & A-I)")
     print("------------------------------------------")
-    read_from_serial_port(args.port, args.baud, args.duration)
+    read_from_serial_port(args.port, args.baud, args.duration, tempo=args.tempo, instrument=args.instrument)